@@ -1,6 +1,9 @@
 import streamlit as st
-from utils.mood_analyzer import detect_mood
-from utils.spotify_helper import setup_spotify, get_recommendations
+from utils.mood_analyzer import detect_mood_with_confidence, KEYWORD_CONFIDENCE_THRESHOLD
+from utils.spotify_helper import iter_recommendations, get_recent_tracks
+from utils.history_refresher import get_user_history, unregister_user_history
+from utils.spotify_pool import get_client_pool
+from utils.image_cache import ThumbnailCache
 from utils.user_preferences import add_preference, update_preference
 import os
 from dotenv import load_dotenv
@@ -36,11 +39,58 @@ if 'rejected_tracks' not in st.session_state:
 # Dictionary to track mood-specific disliked tracks with timestamps
 if 'mood_disliked_tracks' not in st.session_state:
     st.session_state.mood_disliked_tracks = {}
+# Spotify user id of the logged-in user, which keys their pooled client and token cache
+if 'spotify_user_id' not in st.session_state:
+    st.session_state.spotify_user_id = None
 
-# Spotify auth
+# Seconds mood detection may spend before skipping the sentiment model
+MOOD_LATENCY_BUDGET = float(os.getenv('MOOD_LATENCY_BUDGET', '2.0'))
+# Calibrated keyword confidence at which the sentiment model is skipped (see utils/mood_analyzer.py)
+MOOD_CONFIDENCE_THRESHOLD = float(os.getenv('MOOD_CONFIDENCE_THRESHOLD', str(KEYWORD_CONFIDENCE_THRESHOLD)))
+
+# Spotify auth: one client and token cache per Spotify user, sharing a connection pool
 @st.cache_resource
+def init_client_pool():
+    pool = get_client_pool()
+    # Stop refreshing history for users whose client was evicted
+    pool.on_evict = unregister_user_history
+    return pool
+
 def init_spotify():
-    return setup_spotify()
+    """Return the logged-in user's Spotify client, finishing the OAuth redirect if one just arrived"""
+    pool = init_client_pool()
+    if 'code' in st.query_params:
+        user_id = pool.complete_login(st.query_params['code'], st.query_params.get('state'))
+        st.query_params.clear()
+        if user_id:
+            st.session_state.spotify_user_id = user_id
+            st.session_state.pop('history', None)
+        else:
+            st.error("Spotify login failed, please try again.")
+    
+    if not st.session_state.spotify_user_id:
+        return None
+    sp = pool.get_client(st.session_state.spotify_user_id)
+    if sp is None:
+        # No token or it couldn't be refreshed: the user has to log in again
+        st.session_state.spotify_user_id = None
+    return sp
+
+@st.cache_resource
+def init_image_cache():
+    return ThumbnailCache()
+
+def init_history(sp):
+    """Register the Spotify user with the background recently-played refresher without blocking"""
+    history = st.session_state.get('history')
+    # Re-register if the refresher dropped this user for being idle
+    if history is None or history.retired:
+        try:
+            st.session_state.history = get_user_history(st.session_state.spotify_user_id, sp)
+        except Exception as e:
+            logger.error(f"Could not start recently played refresher: {e}")
+            return None
+    return st.session_state.history
 
 def add_mood_disliked_track(mood, track_id):
     """Add a track to the mood-specific disliked tracks with a timestamp"""
@@ -75,6 +125,30 @@ def should_exclude_track(mood, track_id, cooldown_hours=2):
         return True
     return False
 
+def get_album_image_url(track):
+    """Return the medium-size album art URL for a track, or None if it has no images"""
+    images = track.get('album', {}).get('images')
+    if not images:
+        return None
+    return images[1]['url'] if len(images) > 1 else images[0]['url']
+
+def show_album_art(track):
+    """Show a track's album art from the local thumbnail cache, falling back to the remote URL"""
+    image_url = get_album_image_url(track)
+    if image_url:
+        st.image(init_image_cache().get(image_url) or image_url, width=100)
+
+def render_track_preview(track):
+    """Render a lightweight card for a track while recommendations are still streaming in"""
+    img_col, info_col = st.columns([1, 3])
+    with img_col:
+        show_album_art(track)
+    with info_col:
+        st.write(f"### {track['name']}")
+        st.write(f"**Artist:** {track['artists'][0]['name']}")
+        st.write(f"**Album:** {track['album']['name']}")
+    st.write("---")
+
 def get_replacement_track(sp, idx, track):
     """Helper function to get a replacement track and update session state"""
     try:
@@ -92,14 +166,17 @@ def get_replacement_track(sp, idx, track):
         # Try multiple sources for replacement tracks
         replacement_found = False
         
+        # Recently played tracks come from the warm local history when available
+        history = init_history(sp)
+        recent_tracks = get_recent_tracks(sp, history)
+        
         # 1. First try: Get mood-matching tracks from recently played
         if not replacement_found:
-            recent_tracks = sp.current_user_recently_played(limit=50)['items']
-            
             # Filter by mood and exclude rejected and current tracks
             from utils.spotify_helper import filter_tracks_by_mood
             mood_tracks = filter_tracks_by_mood(sp, recent_tracks, current_mood, 
-                                             excluded_ids=st.session_state.rejected_tracks.union(current_track_ids))
+                                             excluded_ids=st.session_state.rejected_tracks.union(current_track_ids),
+                                             history=history)
             
             if mood_tracks:
                 replacement_track = random.choice(mood_tracks)
@@ -109,7 +186,6 @@ def get_replacement_track(sp, idx, track):
         
         # 2. Second try: Get any non-rejected tracks from recently played
         if not replacement_found:
-            recent_tracks = sp.current_user_recently_played(limit=50)['items']
             new_tracks = [t['track'] for t in recent_tracks 
                         if t['track']['id'] not in st.session_state.rejected_tracks 
                         and t['track']['id'] not in current_track_ids]
@@ -153,6 +229,27 @@ def main():
     st.sidebar.markdown("### Your Music Mood Companion")
     st.sidebar.markdown("---")
     
+    # Everything below reads from the user's Spotify library, so log in first
+    sp = init_spotify()
+    if sp is None:
+        login_url = init_client_pool().get_authorize_url()
+        if login_url is None:
+            st.error("Spotify login is unavailable. Please check the app's Spotify credentials.")
+            return
+        st.info("Log in with Spotify so MoodSync can recommend songs from your library.")
+        st.link_button("Log in with Spotify", login_url, type="primary")
+        return
+    
+    if st.sidebar.button("Log out"):
+        init_client_pool().logout(st.session_state.spotify_user_id)
+        st.session_state.spotify_user_id = None
+        st.session_state.pop('history', None)
+        st.session_state.tracks = []
+        st.rerun()
+    
+    # Start warming recently played history in the background as soon as the user is logged in
+    init_history(sp)
+    
     # Display current mood with emoji if one is set
     if st.session_state.mood:
         mood_emojis = {
@@ -188,9 +285,13 @@ def main():
             # Get Spotify client
             sp = init_spotify()
             
-            # Get new recommendations for current mood
+            # Get new recommendations for current mood, rendering each track as it arrives
             if sp:
-                tracks = get_recommendations(sp, st.session_state.mood)
+                tracks = []
+                st.write("Here are some new songs for your mood:")
+                for track in iter_recommendations(sp, st.session_state.mood, history=init_history(sp)):
+                    tracks.append(track)
+                    render_track_preview(track)
                 if tracks:
                     st.session_state.tracks = tracks
                     st.rerun()
@@ -217,31 +318,39 @@ def main():
     # Get recommendations button
     if st.button("Get Recommendations", type="primary"):
         if user_input or direct_mood != "Select...":
-            with st.spinner("Analyzing your mood and finding tracks..."):
+            with st.spinner("Analyzing your mood..."):
                 # Determine mood - either from text input or direct selection
                 if direct_mood != "Select...":
                     mood = direct_mood
                     mood_source = "direct selection"
                 else:
-                    mood = detect_mood(user_input)
-                    mood_source = "text analysis"
+                    detection = detect_mood_with_confidence(user_input,
+                                                            confidence_threshold=MOOD_CONFIDENCE_THRESHOLD,
+                                                            latency_budget=MOOD_LATENCY_BUDGET)
+                    mood = detection['mood']
+                    mood_source = f"{detection['tier']} analysis, {detection['confidence']:.0%} confidence"
                 
                 st.session_state.mood = mood
                 st.session_state.mood_text = user_input  # Store the mood text for later reference
                 
-                # Get Spotify recommendations
-                sp = init_spotify()
-                if sp:
-                    st.session_state.tracks = get_recommendations(sp, mood)
-                    
-                    # Clear rejected tracks when getting new recommendations for a new mood
-                    st.session_state.rejected_tracks = set()
-                    
-                    # Show a success message with the detected mood
-                    st.success(f"Found recommendations for {mood} mood (via {mood_source})")
-                    
-                    # Rerun to display the tracks
-                    st.rerun()
+            # Get Spotify recommendations, rendering each track as it arrives
+            sp = init_spotify()
+            if sp:
+                st.session_state.tracks = []
+                
+                # Clear rejected tracks when getting new recommendations for a new mood
+                st.session_state.rejected_tracks = set()
+                
+                st.write("Here are some songs for your mood:")
+                for track in iter_recommendations(sp, mood, history=init_history(sp)):
+                    st.session_state.tracks.append(track)
+                    render_track_preview(track)
+                
+                # Show a success message with the detected mood
+                st.success(f"Found recommendations for {mood} mood (via {mood_source})")
+                
+                # Rerun to display the tracks with feedback controls
+                st.rerun()
         else:
             st.warning("Please enter how you're feeling or select a mood directly.")
     
@@ -263,9 +372,7 @@ def main():
                 
                 # Display album art
                 with img_col:
-                    if track.get('album', {}).get('images') and len(track['album']['images']) > 0:
-                        st.image(track['album']['images'][1]['url'] if len(track['album']['images']) > 1 else track['album']['images'][0]['url'], 
-                                width=100)
+                    show_album_art(track)
                 
                 # Display track name, artist and album
                 with info_col:
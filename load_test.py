@@ -0,0 +1,342 @@
+"""Multi-session load test for the MoodSync Streamlit app.
+
+Drives many headless sessions of app.py with Streamlit's AppTest against a
+fake Spotify backend across worker processes, then reports throughput, tail
+latency, CPU, memory and whether any preference writes were lost.
+
+By default each worker runs one session at a time, so sessions only share the
+preferences file. With --threads N each worker runs N sessions side by side on
+script threads, like one Streamlit server, sharing its cache_resource objects,
+history refresher and in-process locks.
+
+    python load_test.py --sessions 50 --concurrency 8 --actions 8
+    python load_test.py --sessions 64 --concurrency 2 --threads 8
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+MOOD_TEXTS = [
+    "I'm so happy and excited about the party tonight!",
+    "Feeling tired, I just want to relax and unwind",
+    "Missing my friends, feeling a bit lonely and sad",
+    "Date night with someone I love",
+    "Time to grind and hit my goal at the gym",
+    "I'm angry and need something heavy",
+    "Need to focus and study for my exam",
+    "Just a normal day really",
+]
+ACTION_WEIGHTS = {'like': 0.4, 'dislike': 0.3, 'skip': 0.3}
+
+
+class FakeSpotify:
+    """
+    In-memory stand-in for spotipy.Spotify with configurable per-call latency.
+    """
+
+    def __init__(self, user_id, library_size=200, latency=0.05, seed=None):
+        self.user_id = user_id
+        self.latency = latency
+        rng = random.Random(seed)
+        self._tracks = []
+        self._features = {}
+        for i in range(library_size):
+            track_id = f"{user_id}_track{i}"
+            self._tracks.append({
+                'id': track_id,
+                'name': f"Song {i}",
+                'artists': [{'name': f"Artist {i % 25}"}],
+                'album': {'name': f"Album {i % 40}", 'images': []}
+            })
+            self._features[track_id] = {
+                'valence': rng.random(), 'energy': rng.random(), 'tempo': rng.uniform(60, 180),
+                'acousticness': rng.random(), 'instrumentalness': rng.random(),
+                'speechiness': rng.uniform(0, 0.3), 'loudness': rng.uniform(-20, 0),
+                'mode': rng.randint(0, 1), 'danceability': rng.random()
+            }
+        now = datetime.now(timezone.utc)
+        self._plays = [
+            {'track': rng.choice(self._tracks),
+             'played_at': (now - timedelta(minutes=5 * i)).isoformat().replace('+00:00', 'Z')}
+            for i in range(100)
+        ]
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def current_user(self):
+        self._wait()
+        return {'id': self.user_id}
+
+    def current_user_saved_tracks(self, limit=20):
+        self._wait()
+        return {'items': [{'track': t} for t in self._tracks[:limit]]}
+
+    def current_user_recently_played(self, limit=50, after=None):
+        self._wait()
+        return {'items': self._plays[:limit] if after is None else []}
+
+    def audio_features(self, tracks):
+        self._wait()
+        if isinstance(tracks, str):
+            tracks = [tracks]
+        return [self._features.get(t) for t in tracks]
+
+
+class FakeClientPool:
+    """
+    Stand-in for SpotifyClientPool handing out one FakeSpotify per logged-in user.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.session = None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, user_id):
+        with self._lock:
+            if user_id not in self._clients:
+                self._clients[user_id] = FakeSpotify(user_id, latency=self.latency, seed=user_id)
+            return self._clients[user_id]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def find_button(at, label=None, key=None):
+    for button in at.button:
+        if (label is not None and button.label == label) or (key is not None and button.key == key):
+            return button
+    return None
+
+
+def share_apptest_state():
+    """
+    Let AppTest runs overlap on threads of one process, as sessions do in one
+    Streamlit server. AppTest sets up process-wide state around every run:
+    - it installs a mock Runtime singleton and clears it when done, failing
+      every other run still in flight with "Runtime hasn't been created!", so
+      fall back to the last one seen;
+    - it patches config.get_option for the run, and overlapping patches restore
+      each other's originals, so apply the override once for the process.
+    """
+    import contextlib
+
+    import streamlit.testing.v1.app_test as app_test
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    last_runtime = []
+    original_instance = Runtime.instance.__func__
+
+    def instance(cls):
+        if cls._instance is not None:
+            last_runtime[:] = [cls._instance]
+        elif last_runtime:
+            return last_runtime[0]
+        return original_instance(cls)
+
+    def exists(cls):
+        return cls._instance is not None or bool(last_runtime)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+
+def share_script_cache():
+    """
+    Compile app.py once per worker like a Streamlit server, rather than on every
+    AppTest run; concurrent compiles can also fail on Python 3.11 (ast.parse).
+    """
+    import streamlit.testing.v1.app_test as app_test
+    import streamlit.testing.v1.local_script_runner as local_script_runner
+
+    script_cache = app_test.ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+def init_worker(latency, preferences_file, no_model, threads):
+    """
+    Prepare a worker process: fake Spotify, the shared preferences file,
+    optionally no model, and AppTest patched for `threads` concurrent sessions.
+    """
+    share_script_cache()
+    if threads > 1:
+        share_apptest_state()
+
+    if no_model:
+        import transformers
+
+        def _no_pipeline(*a, **kw):
+            raise RuntimeError("model disabled for load test")
+        transformers.pipeline = _no_pipeline
+
+    # Import app dependencies up front so the model loads once per worker, outside the timings
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+    import utils.mood_analyzer  # noqa: F401
+    import utils.spotify_pool
+    import utils.user_preferences
+
+    utils.spotify_pool.get_client_pool = lambda: FakeClientPool(latency)
+    utils.user_preferences.PREFERENCES_FILE = preferences_file
+
+
+def run_session(session_no, actions, timeout):
+    """
+    Script one user: describe a mood, get recommendations, then Like/Dislike/Skip tracks.
+    Returns the (mood, track_id) pairs liked, the error count and per-action latencies.
+    """
+    from streamlit.runtime.state import SCRIPT_RUN_WITHOUT_ERRORS_KEY
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(session_no)
+    liked = set()
+    errors = 0
+    latencies = {}
+
+    def timed(action, fn):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            errors += 1
+            print(f"session {session_no}: {action} failed: {e!r}", file=sys.stderr)
+            traceback.print_exc()
+        latencies.setdefault(action, []).append(time.perf_counter() - start)
+        for exception in at.exception:
+            errors += 1
+            print(f"session {session_no}: {action} raised: {exception.value}", file=sys.stderr)
+        if not at.exception and not at.session_state[SCRIPT_RUN_WITHOUT_ERRORS_KEY]:
+            errors += 1  # e.g. a compile error, which leaves no exception element
+            print(f"session {session_no}: {action} did not run cleanly", file=sys.stderr)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.session_state['spotify_user_id'] = f"user{session_no}"  # Already logged in
+    timed('load', at.run)
+    if not at.text_area:
+        return liked, errors + 1, latencies
+    at.text_area[0].input(rng.choice(MOOD_TEXTS))
+    timed('get_recommendations', lambda: find_button(at, label="Get Recommendations").click().run())
+
+    for _ in range(actions):
+        tracks = at.session_state['tracks'] if 'tracks' in at.session_state else []
+        if not tracks:
+            break
+        idx = rng.randrange(len(tracks))
+        track = tracks[idx]
+        action = rng.choices(list(ACTION_WEIGHTS), weights=list(ACTION_WEIGHTS.values()))[0]
+        button = find_button(at, key=f"{action}_track_{idx}_{track['id']}")
+        if button is None:
+            continue
+        timed(action, lambda: button.click().run())
+        if action == 'like':
+            liked.add((at.session_state['mood'], track['id']))
+
+    return liked, errors, latencies
+
+
+def run_session_group(session_nos, actions, timeout):
+    """
+    Run a group of sessions side by side on threads of this worker process.
+    Returns each session's run_session result and the CPU seconds the group used.
+    """
+    cpu_start = time.process_time()
+    with ThreadPoolExecutor(max_workers=len(session_nos)) as executor:
+        results = list(executor.map(lambda n: run_session(n, actions, timeout), session_nos))
+    return results, time.process_time() - cpu_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test MoodSync with many concurrent sessions")
+    parser.add_argument('--sessions', type=int, default=50, help="Total sessions to run")
+    parser.add_argument('--concurrency', type=int, default=8, help="Worker processes")
+    parser.add_argument('--threads', type=int, default=1, help="Sessions each worker runs at once")
+    parser.add_argument('--actions', type=int, default=8, help="Like/Dislike/Skip clicks per session")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake Spotify latency per call (s)")
+    parser.add_argument('--timeout', type=float, default=120, help="Per-run AppTest timeout (s)")
+    parser.add_argument('--no-model', action='store_true', help="Use keyword-only mood detection")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+    import utils.user_preferences
+
+    prefs_dir = tempfile.mkdtemp(prefix='moodsync_load_')
+    preferences_file = os.path.join(prefs_dir, 'user_preferences.json')
+    utils.user_preferences.PREFERENCES_FILE = preferences_file
+
+    executor = ProcessPoolExecutor(
+        max_workers=args.concurrency,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=(args.latency, preferences_file, args.no_model, args.threads)
+    )
+    groups = [list(range(start, min(start + args.threads, args.sessions)))
+              for start in range(0, args.sessions, args.threads)]
+    with executor:
+        # Start every worker before timing so imports and model loads aren't counted
+        list(executor.map(time.sleep, [0.5] * args.concurrency))
+        wall_start = time.perf_counter()
+        group_results = list(executor.map(run_session_group, groups,
+                                          [args.actions] * len(groups), [args.timeout] * len(groups)))
+        wall = time.perf_counter() - wall_start
+    usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)  # Workers have exited and been reaped
+
+    results = [result for group, _ in group_results for result in group]
+    expected = set().union(*(liked for liked, _, _ in results))
+    errors = sum(e for _, e, _ in results)
+    cpu = sum(group_cpu for _, group_cpu in group_results)
+    latencies = {}
+    for _, _, session_latencies in results:
+        for action, values in session_latencies.items():
+            latencies.setdefault(action, []).extend(values)
+    saved = utils.user_preferences.load_preferences()
+    found = {(mood, p['track_id']) for mood, prefs in saved.items() for p in prefs}
+    lost = expected - found
+
+    total_runs = sum(len(v) for v in latencies.values())
+    if args.threads > 1:
+        mode = f"{args.threads} threads each, sharing in-process state"
+    else:
+        mode = "one session at a time each, sharing only the preferences file"
+    workers = f"{args.concurrency} worker process{'es' if args.concurrency != 1 else ''}"
+    print(f"\nSessions: {args.sessions} ({workers}, {mode}), errors: {errors}")
+    print(f"Wall time: {wall:.1f}s, throughput: {total_runs / wall:.1f} script runs/s")
+    print(f"CPU: {cpu:.1f}s ({cpu / wall:.0%} of one core), "
+          f"peak worker RSS: {usage_after.ru_maxrss / 1024:.0f} MB")
+    print(f"{'action':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for action, values in sorted(latencies.items()):
+        print(f"{action:<22}{len(values):>7}{percentile(values, 50) * 1000:>10.0f}"
+              f"{percentile(values, 95) * 1000:>10.0f}{percentile(values, 99) * 1000:>10.0f}"
+              f"{max(values) * 1000:>10.0f}")
+    print(f"Preference writes: {len(expected)} expected, {len(lost)} lost")
+    return 1 if lost or errors else 0
+
+
+if __name__ == '__main__':
+    # AppTest replaces __main__ in the workers with app.py, so hand them functions
+    # pickled by this module's importable name rather than '__main__'
+    import load_test
+    sys.exit(load_test.main())
@@ -0,0 +1,123 @@
+import io
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+from utils.image_cache import ThumbnailCache
+
+
+def make_png(size=(640, 640), color=(200, 30, 90)):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, format='PNG')
+    return output.getvalue()
+
+
+@pytest.fixture
+def image_server():
+    """
+    Local stand-in for the album art CDN: serves one PNG at any /art/* path,
+    stalls for a second on /slow/*, 404s everywhere else, and counts requests per path.
+    """
+    png = make_png()
+    requests_seen = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen[self.path] = requests_seen.get(self.path, 0) + 1
+            if self.path.startswith('/slow/'):
+                time.sleep(1)
+            if not self.path.startswith('/art/'):
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(png)))
+            self.end_headers()
+            self.wfile.write(png)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield base_url, requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_downloads_once_and_serves_100px_thumbnail(image_server, tmp_path):
+    base_url, requests_seen = image_server
+    cache = ThumbnailCache(cache_dir=str(tmp_path))
+
+    first = cache.get(f"{base_url}/art/a")
+    second = cache.get(f"{base_url}/art/a")
+
+    assert requests_seen == {'/art/a': 1}
+    assert first == second
+    with Image.open(io.BytesIO(first)) as thumbnail:
+        assert thumbnail.format == 'JPEG'
+        assert thumbnail.size == (100, 100)
+
+
+def test_cache_survives_restart(image_server, tmp_path):
+    base_url, requests_seen = image_server
+    ThumbnailCache(cache_dir=str(tmp_path)).get(f"{base_url}/art/a")
+
+    assert ThumbnailCache(cache_dir=str(tmp_path)).get(f"{base_url}/art/a") is not None
+    assert requests_seen == {'/art/a': 1}
+
+
+def test_evicts_least_recently_used_when_over_max_bytes(image_server, tmp_path):
+    base_url, requests_seen = image_server
+    probe = ThumbnailCache(cache_dir=str(tmp_path / 'probe')).get(f"{base_url}/art/probe")
+    cache = ThumbnailCache(cache_dir=str(tmp_path / 'cache'), max_bytes=2 * len(probe))
+
+    cache.get(f"{base_url}/art/a")
+    cache.get(f"{base_url}/art/b")
+    cache.get(f"{base_url}/art/a")  # a is now more recent than b
+    cache.get(f"{base_url}/art/c")  # Over budget: b goes
+
+    assert len(os.listdir(tmp_path / 'cache')) == 2
+    cache.get(f"{base_url}/art/a")
+    cache.get(f"{base_url}/art/c")
+    assert requests_seen['/art/a'] == 1 and requests_seen['/art/c'] == 1
+    cache.get(f"{base_url}/art/b")
+    assert requests_seen['/art/b'] == 2
+
+
+def test_missing_image_returns_none(image_server, tmp_path):
+    base_url, requests_seen = image_server
+    cache = ThumbnailCache(cache_dir=str(tmp_path))
+
+    assert cache.get(f"{base_url}/missing.png") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_url_is_not_fetched_again_until_ttl(image_server, tmp_path):
+    base_url, requests_seen = image_server
+    cache = ThumbnailCache(cache_dir=str(tmp_path))
+
+    assert cache.get(f"{base_url}/missing.png") is None
+    assert cache.get(f"{base_url}/missing.png") is None
+    assert requests_seen == {'/missing.png': 1}
+
+    expired = ThumbnailCache(cache_dir=str(tmp_path), failure_ttl=0)
+    expired.get(f"{base_url}/missing.png")
+    expired.get(f"{base_url}/missing.png")
+    assert requests_seen == {'/missing.png': 3}
+
+
+def test_slow_image_times_out_without_retrying(image_server, tmp_path):
+    base_url, requests_seen = image_server
+    cache = ThumbnailCache(cache_dir=str(tmp_path), timeout=0.2)
+
+    start = time.perf_counter()
+    assert cache.get(f"{base_url}/slow/a") is None
+    assert time.perf_counter() - start < 0.9
+    assert requests_seen == {'/slow/a': 1}
@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import logging
+from typing import Dict, List, Any, Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler('app.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 200  # Plays kept per user
+REFRESH_INTERVAL = 60  # Seconds between background polls
+IDLE_TIMEOUT = 30 * 60  # Users whose history isn't read for this long stop being polled
+AUDIO_FEATURES_BATCH = 100  # Max IDs per audio_features request
+
+
+def _played_at_ms(item: Dict[str, Any]) -> int:
+    """
+    Convert a recently-played item's ISO 'played_at' into unix milliseconds.
+    """
+    played_at = item['played_at'].replace('Z', '+00:00')
+    return int(datetime.fromisoformat(played_at).timestamp() * 1000)
+
+
+class RecentlyPlayedHistory:
+    """
+    Bounded, per-user local copy of recently played tracks and their audio features.
+    """
+
+    def __init__(self, max_items: int = HISTORY_SIZE):
+        self._items = deque(maxlen=max_items)  # Newest play first
+        self._features: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._cursor: Optional[int] = None  # 'after' timestamp in unix ms
+        self._lock = threading.Lock()
+        self.is_warm = False
+        self.retired = False  # Set once the refresher drops this history; it never warms again
+        self.last_access = time.monotonic()  # Last read, for the refresher's idle expiry
+
+    def items(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Return up to `limit` of the newest plays, in the same shape as the
+        'items' of current_user_recently_played.
+        """
+        self.last_access = time.monotonic()
+        with self._lock:
+            return list(self._items)[:limit]
+
+    def poll(self, sp) -> int:
+        """
+        Fetch plays newer than the cursor, append them to the history and
+        prefetch audio features for unseen track IDs.
+        Returns the number of new plays.
+        """
+        try:
+            if self._cursor is None:
+                response = sp.current_user_recently_played(limit=50)
+            else:
+                response = sp.current_user_recently_played(limit=50, after=self._cursor)
+            new_items = response.get('items', []) if response else []
+
+            with self._lock:
+                # Spotify returns newest first, so push oldest first to keep that order
+                for item in reversed(new_items):
+                    self._items.appendleft(item)
+
+                if new_items:
+                    self._cursor = max(_played_at_ms(item) for item in new_items)
+                elif self._cursor is None:
+                    self._cursor = int(time.time() * 1000)
+
+                missing_ids = []
+                for item in new_items:
+                    track_id = item['track']['id']
+                    if track_id not in self._features and track_id not in missing_ids:
+                        missing_ids.append(track_id)
+
+            if missing_ids:
+                self._fetch_features(sp, missing_ids)
+
+            self.is_warm = not self.retired
+            if new_items:
+                logger.info(f"Appended {len(new_items)} new plays to recently played history")
+            return len(new_items)
+        except Exception as e:
+            logger.error(f"Error polling recently played history: {str(e)}")
+            return 0
+
+    def audio_features(self, sp, track_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Return audio features for `track_ids` in order, fetching only cache misses.
+        """
+        self.last_access = time.monotonic()
+        with self._lock:
+            missing_ids = [t for t in dict.fromkeys(track_ids) if t not in self._features]
+        if missing_ids:
+            self._fetch_features(sp, missing_ids)
+        with self._lock:
+            return [self._features.get(t) for t in track_ids]
+
+    def _fetch_features(self, sp, track_ids: List[str]):
+        for start in range(0, len(track_ids), AUDIO_FEATURES_BATCH):
+            batch = track_ids[start:start + AUDIO_FEATURES_BATCH]
+            features = sp.audio_features(batch) or []
+            with self._lock:
+                for track_id, feature in zip(batch, features):
+                    self._features[track_id] = feature
+                # Bound the cache to tracks still in the history
+                if len(self._features) > 2 * self._items.maxlen:
+                    live_ids = {item['track']['id'] for item in self._items}
+                    for track_id in list(self._features):
+                        if track_id not in live_ids:
+                            del self._features[track_id]
+
+
+class HistoryRefresher(threading.Thread):
+    """
+    Daemon thread that keeps every registered user's history warm.
+    Newly registered users are polled right away in the background; everyone
+    is re-polled every `interval` seconds. Users whose history goes unread for
+    `idle_timeout` seconds are dropped.
+    """
+
+    def __init__(self, interval: float = REFRESH_INTERVAL, idle_timeout: float = IDLE_TIMEOUT):
+        super().__init__(name="history-refresher", daemon=True)
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._users: Dict[str, Any] = {}  # user_key -> (sp, history)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()  # Set when a new user is waiting for their first poll
+
+    def register(self, user_key: str, sp) -> RecentlyPlayedHistory:
+        """
+        Start tracking a user and return their history without blocking.
+        A new user's history is cold until the refresher's first poll warms it.
+        """
+        with self._lock:
+            if user_key in self._users:
+                history = self._users[user_key][1]
+                self._users[user_key] = (sp, history)
+                history.last_access = time.monotonic()
+                return history
+            history = RecentlyPlayedHistory()
+            self._users[user_key] = (sp, history)
+        self._wake_event.set()
+        return history
+
+    def unregister(self, user_key: str):
+        """
+        Stop polling a user and drop the refresher's reference to their client.
+        Their history goes cold, so readers fall back to the API until re-registered.
+        """
+        with self._lock:
+            entry = self._users.pop(user_key, None)
+        if entry is not None:
+            entry[1].retired = True
+            entry[1].is_warm = False
+            logger.info(f"Stopped refreshing recently played history for {user_key}")
+
+    def _expire_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [user_key for user_key, (_, history) in self._users.items()
+                    if now - history.last_access > self.idle_timeout]
+        for user_key in idle:
+            self.unregister(user_key)
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def run(self):
+        logger.info("History refresher started")
+        next_refresh = time.monotonic() + self.interval
+        while True:
+            self._wake_event.wait(max(0.0, next_refresh - time.monotonic()))
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            refresh_all = time.monotonic() >= next_refresh
+            if refresh_all:
+                self._expire_idle()
+                next_refresh = time.monotonic() + self.interval
+            with self._lock:
+                users = list(self._users.values())
+            for sp, history in users:
+                # Between full refreshes only newly registered users are polled
+                if refresh_all or not history.is_warm:
+                    history.poll(sp)
+        logger.info("History refresher stopped")
+
+
+_refresher: Optional[HistoryRefresher] = None
+_refresher_lock = threading.Lock()
+
+
+def get_refresher() -> HistoryRefresher:
+    """
+    Return the process-wide refresher, starting it on first use.
+    """
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = HistoryRefresher()
+            _refresher.start()
+        return _refresher
+
+
+def get_user_history(user_key: str, sp) -> RecentlyPlayedHistory:
+    """
+    Register a user with the background refresher and return their history,
+    which warms in the background; until then readers fall back to the API.
+    """
+    return get_refresher().register(user_key, sp)
+
+
+def unregister_user_history(user_key: str):
+    """
+    Stop refreshing a user's history, e.g. when their Spotify client is evicted.
+    """
+    if _refresher is not None:
+        _refresher.unregister(user_key)
@@ -0,0 +1,139 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+import logging
+from typing import Optional
+
+import requests
+from PIL import Image
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler('app.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = '.image_cache'
+THUMBNAIL_SIZE = 100  # Matches the width album art is shown at
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+FETCH_TIMEOUT = 3  # Seconds; art is fetched while the page renders, so fail fast and don't retry
+FAILURE_TTL = 5 * 60  # Seconds a failed URL is remembered and not fetched again
+MAX_FAILURES = 1000
+
+
+class ThumbnailCache:
+    """
+    Disk cache of resized album art thumbnails with size-bounded LRU eviction.
+    URLs that fail to download are remembered for `failure_ttl` seconds, so a
+    broken image doesn't stall every rerun.
+    """
+
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES,
+                 size: int = THUMBNAIL_SIZE, session: Optional[requests.Session] = None,
+                 timeout: float = FETCH_TIMEOUT, failure_ttl: float = FAILURE_TTL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.size = size
+        self.session = session or requests.Session()  # Without retries, unlike the Spotify session
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        self._index = OrderedDict()  # filename -> size in bytes, least recently used first
+        self._failures = OrderedDict()  # filename -> monotonic time of the failed fetch, oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._total_bytes += size
+
+    def _filename(self, url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest() + '.jpg'
+
+    def get(self, url: str) -> Optional[bytes]:
+        """
+        Return thumbnail bytes for `url`, downloading and resizing it on first use.
+        Returns None if the image could not be fetched, now or within the last failure_ttl seconds.
+        """
+        name = self._filename(url)
+        path = os.path.join(self.cache_dir, name)
+
+        with self._lock:
+            if name in self._index:
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    self._index.move_to_end(name)
+                    os.utime(path)  # Persist recency across restarts
+                    return data
+                except OSError:
+                    self._total_bytes -= self._index.pop(name)
+            failed_at = self._failures.get(name)
+            if failed_at is not None:
+                if time.monotonic() - failed_at < self.failure_ttl:
+                    return None
+                del self._failures[name]
+
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            data = self._resize(response.content)
+        except Exception as e:
+            logger.error(f"Error fetching album image {url}: {str(e)}")
+            with self._lock:
+                self._failures.pop(name, None)
+                self._failures[name] = time.monotonic()
+                while len(self._failures) > MAX_FAILURES:
+                    self._failures.popitem(last=False)
+            return None
+
+        with self._lock:
+            try:
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Error caching album image {url}: {str(e)}")
+                return data
+            if name in self._index:
+                self._total_bytes -= self._index.pop(name)
+            self._index[name] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+        return data
+
+    def _resize(self, content: bytes) -> bytes:
+        with Image.open(io.BytesIO(content)) as image:
+            image = image.convert('RGB')
+            image.thumbnail((self.size, self.size))
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=85)
+            return output.getvalue()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            name, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            logger.info(f"Evicted cached album image {name}")
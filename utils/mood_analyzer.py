@@ -1,6 +1,10 @@
 import torch
 from transformers import pipeline
+import json
 import logging
+import os
+import re
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -13,6 +17,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = "finiteautomata/bertweet-base-sentiment-analysis"
+
+# Directory of local safetensors weights to memory-map and share across worker
+# processes (create with: python -m utils.shared_model <MODEL_NAME> <dir>)
+MODEL_DIR = os.getenv('MOOD_MODEL_DIR')
+
 def get_mood_analyzer():
     try:
         logger.info("Initializing mood analyzer...")
@@ -20,9 +30,15 @@ def get_mood_analyzer():
         
         # Try to load the model with a timeout
         try:
+            if MODEL_DIR:
+                from utils.shared_model import load_shared_pipeline, get_memory_usage
+                analyzer = load_shared_pipeline(MODEL_DIR)
+                logger.info(f"Mood analyzer memory-mapped from {MODEL_DIR} (pid {os.getpid()}, "
+                            f"memory MB: {get_memory_usage()})")
+                return analyzer
             analyzer = pipeline(
                 "text-classification", 
-                model="finiteautomata/bertweet-base-sentiment-analysis",
+                model=MODEL_NAME,
                 device=-1  # -1 means CPU
             )
             logger.info("Mood analyzer initialized successfully")
@@ -45,105 +61,395 @@ def get_mood_category(sentiment):
     else:  # NEUTRAL
         return 'MOTIVATIONAL'
 
-def detect_mood(text):
+# Define keyword groups with stronger matching for expanded moods
+MOOD_KEYWORDS = {
+    "UPBEAT": ['happy', 'joy', 'excited', 'upbeat', 'cheerful', 'fun', 'energetic', 
+              'party', 'dance', 'celebrate', 'positive', 'great', 'awesome', 
+              'amazing', 'good', 'wonderful', 'fantastic', 'excellent', 'thrilled',
+              'delighted', 'ecstatic', 'enthusiastic', 'lively', 'vibrant'],
+    
+    "CALMING": ['relax', 'calm', 'peaceful', 'quiet', 'chill', 'mellow', 'gentle', 
+              'soothing', 'tired', 'sleepy', 'tranquil', 'serene', 'rest', 
+              'meditate', 'unwind', 'breathe', 'comfort', 'ease', 'harmony'],
+    
+    "MELANCHOLY": ['sad', 'depressed', 'down', 'blue', 'unhappy', 'lonely', 'missing',
+                 'heartbreak', 'tears', 'cry', 'grief', 'sorrow', 'regret', 'nostalgia',
+                 'wistful', 'yearning', 'longing', 'hurt', 'pain', 'emotional'],
+    
+    "ROMANTIC": ['love', 'heart', 'romantic', 'passion', 'desire', 'affection',
+               'intimate', 'tender', 'sweet', 'adore', 'cherish', 'embrace',
+               'relationship', 'together', 'couple', 'date', 'kiss'],
+    
+    "MOTIVATIONAL": ['motivated', 'inspired', 'determined', 'focused', 'energized', 
+                   'strong', 'power', 'achieve', 'success', 'goal', 'win', 
+                   'challenge', 'overcome', 'push', 'drive', 'ambition', 'hustle',
+                   'grind', 'discipline', 'persistence', 'dedication'],
+    
+    "INTENSE": ['angry', 'rage', 'fury', 'intense', 'aggressive', 'powerful', 
+              'fierce', 'wild', 'rebel', 'fight', 'battle', 'strength', 'force',
+              'heavy', 'dark', 'deep', 'raw', 'primal', 'unstoppable'],
+    
+    "FOCUSED": ['study', 'work', 'concentrate', 'focus', 'productive', 'efficient',
+              'learn', 'think', 'create', 'build', 'develop', 'progress', 'improve',
+              'grow', 'analyze', 'solve', 'research', 'code', 'write', 'read']
+}
+
+# Labelled (text, mood) samples that keyword confidence and the default
+# threshold (KEYWORD_CONFIDENCE_THRESHOLD, below) are fitted against
+MOOD_SAMPLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mood_samples.json')
+MAX_CALIBRATED_MARGIN = 2  # Leads of this many matches or more share one bucket
+
+# Running average of sentiment model latency in seconds, used to honour latency budgets
+_model_latency = None
+_model_calls = 0
+# Each budget skip shrinks the estimate, so one slow call can't disable the model for good
+MODEL_LATENCY_DECAY = 0.8
+
+# Long-text chunking: texts longer than WINDOW_CHARS are split into sentence-aligned
+# windows (short enough to fit bertweet's 128-token limit), scored BATCH_SIZE at a time
+WINDOW_CHARS = 300
+BATCH_SIZE = 8
+MAX_WINDOWS = 64  # Bounds memory and latency however long the text is
+EARLY_EXIT_MARGIN = 5  # Stop reading once one mood leads the keyword counts by this much
+EARLY_EXIT_CONFIDENCE = 0.8  # ...or one sentiment label holds this share of the votes
+
+_SENTENCE_PATTERN = re.compile(r'[^.!?\n]+[.!?\n]*|[.!?\n]+')
+
+def _keyword_scores(text_lower):
+    # Count keyword matches in each category
+    return {mood: sum(1 for word in keywords if word in text_lower)
+            for mood, keywords in MOOD_KEYWORDS.items()}
+
+def _model_fits_budget(start, latency_budget, n_texts=1):
+    global _model_latency
+    if latency_budget is None or _model_latency is None:
+        return True
+    remaining = latency_budget - (time.perf_counter() - start)
+    expected = _model_latency * n_texts
+    if expected > remaining:
+        logger.info(f"Skipping sentiment model: ~{expected:.2f}s exceeds {remaining:.2f}s budget")
+        _model_latency *= MODEL_LATENCY_DECAY
+        return False
+    return True
+
+def _record_model_latency(elapsed):
+    global _model_latency, _model_calls
+    _model_calls += 1
+    if _model_calls == 1:
+        return  # The first call includes warm-up and says little about steady-state latency
+    _model_latency = elapsed if _model_latency is None else 0.8 * _model_latency + 0.2 * elapsed
+
+def iter_text_windows(text, window_chars=WINDOW_CHARS):
+    """Yield sentence-aligned windows of at most `window_chars` characters
+    
+    Sentences are packed together until the next one would overflow a window;
+    a single sentence longer than a window is split at word boundaries.
+    """
+    window = ""
+    for match in _SENTENCE_PATTERN.finditer(text):
+        sentence = match.group().strip()
+        if not sentence:
+            continue
+        while len(sentence) > window_chars:
+            if window:
+                yield window
+                window = ""
+            cut = sentence.rfind(' ', 0, window_chars)
+            cut = cut if cut > 0 else window_chars
+            yield sentence[:cut]
+            sentence = sentence[cut:].strip()
+        if window and len(window) + 1 + len(sentence) > window_chars:
+            yield window
+            window = ""
+        window = f"{window} {sentence}" if window else sentence
+    if window:
+        yield window
+
+def keyword_margin(mood_scores):
+    """How many more keyword matches the leading mood has than the runner-up"""
+    ranked = sorted(mood_scores.values(), reverse=True) + [0, 0]
+    return ranked[0] - ranked[1]
+
+def calibrate_keyword_confidence(samples):
+    """Fit keyword confidence to labelled samples
+    
+    Args:
+        samples: Iterable of (text, mood) pairs; the moods can be hand labels
+            or sentiment model output to calibrate against model agreement
+        
+    Returns:
+        dict: Keyword margin (0..MAX_CALIBRATED_MARGIN, 0 being a tie between
+            moods with matches) -> smoothed share of samples with that margin
+            whose keyword leader matched the label, made non-decreasing in the margin
+    """
+    counts = {margin: [0, 0] for margin in range(0, MAX_CALIBRATED_MARGIN + 1)}
+    for text, mood in samples:
+        mood_scores = _keyword_scores(text.lower())
+        if not any(mood_scores.values()):
+            continue  # No matches: the keywords have nothing to say
+        margin = keyword_margin(mood_scores)
+        bucket = counts[min(margin, MAX_CALIBRATED_MARGIN)]
+        bucket[0] += max(mood_scores, key=mood_scores.get) == mood
+        bucket[1] += 1
+    
+    # Pool adjacent buckets that break monotonicity, then Laplace-smooth
+    pooled = []  # [correct, total, margins]
+    for margin in sorted(counts):
+        correct, total = counts[margin]
+        pooled.append([correct, total, [margin]])
+        while (len(pooled) > 1 and
+               (pooled[-2][0] + 1) / (pooled[-2][1] + 2) > (pooled[-1][0] + 1) / (pooled[-1][1] + 2)):
+            last = pooled.pop()
+            pooled[-1] = [pooled[-1][0] + last[0], pooled[-1][1] + last[1], pooled[-1][2] + last[2]]
+    return {margin: (correct + 1) / (total + 2)
+            for correct, total, margins in pooled for margin in margins}
+
+def load_mood_samples(path=MOOD_SAMPLES_FILE):
+    try:
+        with open(path, 'r') as f:
+            return [(s['text'], s['mood']) for s in json.load(f)]
+    except Exception as e:
+        logger.error(f"Error loading mood samples: {str(e)}")
+        return []
+
+MOOD_SAMPLES = load_mood_samples()
+KEYWORD_CALIBRATION = calibrate_keyword_confidence(MOOD_SAMPLES)
+logger.info(f"Keyword confidence calibrated on {len(MOOD_SAMPLES)} samples: {KEYWORD_CALIBRATION}")
+
+def keyword_confidence(mood_scores):
+    """Calibrated confidence in [0, 1] that the top keyword mood is correct
+
+    Looks up the leader's margin over the runner-up (0 for a tie) in
+    KEYWORD_CALIBRATION; no matches gives 0.
+    """
+    if not any(mood_scores.values()):
+        return 0.0
+    return KEYWORD_CALIBRATION.get(min(keyword_margin(mood_scores), MAX_CALIBRATED_MARGIN), 0.0)
+
+def _sentiment_to_mood(label, text_lower):
+    # bertweet emits POS/NEG/NEU; accept the long forms too
+    if label in ('POS', 'POSITIVE'):
+        # For positive sentiment, check if it's more energetic or calm
+        if any(word in text_lower for word in ['energetic', 'excited', 'happy', 'fun']):
+            return "UPBEAT"
+        elif any(word in text_lower for word in ['love', 'heart', 'sweet']):
+            return "ROMANTIC"
+        else:
+            return "UPBEAT"
+    elif label in ('NEG', 'NEGATIVE'):
+        # For negative sentiment, check if it's sad or angry
+        if any(word in text_lower for word in ['angry', 'mad', 'rage', 'hate']):
+            return "INTENSE"
+        else:
+            return "MELANCHOLY"
+    else:  # Neutral
+        # For neutral, check if it's focused or motivational
+        if any(word in text_lower for word in ['work', 'study', 'focus']):
+            return "FOCUSED"
+        else:
+            return "MOTIVATIONAL"
+
+def model_path_accuracy(samples, analyzer=None):
+    """Share of labelled samples the sentiment model path gets right
+    
+    Args:
+        samples: Sequence of (text, mood) pairs
+        analyzer: Sentiment pipeline to measure; if None, every sample gets
+            its best sentiment label, giving an upper bound for any model
+    
+    Returns:
+        float: Accuracy of _sentiment_to_mood over the samples, 0 if there are none
+    """
+    if not samples:
+        return 0.0
+    if analyzer is None:
+        correct = sum(mood in {_sentiment_to_mood(label, text.lower()) for label in ('POS', 'NEG', 'NEU')}
+                      for text, mood in samples)
+    else:
+        results = analyzer([text for text, _ in samples], batch_size=BATCH_SIZE, truncation=True)
+        correct = sum(_sentiment_to_mood(result['label'], text.lower()) == mood
+                      for (text, mood), result in zip(samples, results))
+    return correct / len(samples)
+
+# Keyword results at or above this confidence skip the sentiment model. Keywords
+# win wherever their calibrated precision is at least what the model path can
+# reach on the same samples; the bound for a perfect sentiment model is used, as
+# _sentiment_to_mood can't produce every mood (never CALMING, for one). On the
+# bundled samples that is 0.56: any clear keyword leader (0.79+) skips the model,
+# while ties (0.47) and texts without keywords still run it. Override with
+# MOOD_CONFIDENCE_THRESHOLD: lower skips the model more often, above 0.93 always
+# runs it. `python -m utils.mood_analyzer` prints the calibration together with
+# the loaded model's measured accuracy on the samples to tune against.
+KEYWORD_CONFIDENCE_THRESHOLD = round(model_path_accuracy(MOOD_SAMPLES), 2) if MOOD_SAMPLES else 0.5
+
+def _heuristic_mood(text, text_lower):
+    # Use text content analysis as a fallback
+    question_words = ['how', 'what', 'why', 'when', 'where', 'who']
+    if any(text_lower.startswith(word) for word in question_words) or '?' in text:
+        return "FOCUSED"  # Questions often indicate a focused state
+    
+    # Check for exclamation marks or all caps (excitement or intensity)
+    if '!' in text or text.isupper():
+        return "UPBEAT" if any(word in text_lower for word in ['love', 'happy', 'great']) else "INTENSE"
+    
+    # If still no match, use text length as a heuristic
+    if len(text) < 15:
+        return "UPBEAT"  # Short texts tend to be more direct/energetic
+    elif len(text) > 40:
+        return "CALMING"  # Longer texts tend to be more reflective
+    else:
+        return "MOTIVATIONAL"  # Default for medium-length text
+
+def detect_mood_with_confidence(text, confidence_threshold=KEYWORD_CONFIDENCE_THRESHOLD,
+                                latency_budget=None):
+    """Detect mood with a keyword -> sentiment model -> heuristic cascade
+    
+    Args:
+        text: The user's description of how they feel
+        confidence_threshold: Keyword confidence at which the model is skipped
+        latency_budget: Seconds this call may spend; the model is skipped when
+            its typical latency would exceed what is left
+        
+    Returns:
+        dict: 'mood', 'confidence' in [0, 1] and 'tier' ('keyword', 'model'
+            or 'heuristic') that decided the mood
+    
+    Texts longer than WINDOW_CHARS are handed to detect_mood_chunked.
+    """
+    if len(text) > WINDOW_CHARS:
+        return detect_mood_chunked(text, confidence_threshold, latency_budget)
+    
+    start = time.perf_counter()
     try:
         # Map text to mood based on emotional content
         text_lower = text.lower()
+        mood_scores = _keyword_scores(text_lower)
         
-        # Define keyword groups with stronger matching for expanded moods
-        mood_keywords = {
-            "UPBEAT": ['happy', 'joy', 'excited', 'upbeat', 'cheerful', 'fun', 'energetic', 
-                      'party', 'dance', 'celebrate', 'positive', 'great', 'awesome', 
-                      'amazing', 'good', 'wonderful', 'fantastic', 'excellent', 'thrilled',
-                      'delighted', 'ecstatic', 'enthusiastic', 'lively', 'vibrant'],
-            
-            "CALMING": ['relax', 'calm', 'peaceful', 'quiet', 'chill', 'mellow', 'gentle', 
-                      'soothing', 'tired', 'sleepy', 'tranquil', 'serene', 'rest', 
-                      'meditate', 'unwind', 'breathe', 'comfort', 'ease', 'harmony'],
-            
-            "MELANCHOLY": ['sad', 'depressed', 'down', 'blue', 'unhappy', 'lonely', 'missing',
-                         'heartbreak', 'tears', 'cry', 'grief', 'sorrow', 'regret', 'nostalgia',
-                         'wistful', 'yearning', 'longing', 'hurt', 'pain', 'emotional'],
-            
-            "ROMANTIC": ['love', 'heart', 'romantic', 'passion', 'desire', 'affection',
-                       'intimate', 'tender', 'sweet', 'adore', 'cherish', 'embrace',
-                       'relationship', 'together', 'couple', 'date', 'kiss'],
-            
-            "MOTIVATIONAL": ['motivated', 'inspired', 'determined', 'focused', 'energized', 
-                           'strong', 'power', 'achieve', 'success', 'goal', 'win', 
-                           'challenge', 'overcome', 'push', 'drive', 'ambition', 'hustle',
-                           'grind', 'discipline', 'persistence', 'dedication'],
-            
-            "INTENSE": ['angry', 'rage', 'fury', 'intense', 'aggressive', 'powerful', 
-                      'fierce', 'wild', 'rebel', 'fight', 'battle', 'strength', 'force',
-                      'heavy', 'dark', 'deep', 'raw', 'primal', 'unstoppable'],
-            
-            "FOCUSED": ['study', 'work', 'concentrate', 'focus', 'productive', 'efficient',
-                      'learn', 'think', 'create', 'build', 'develop', 'progress', 'improve',
-                      'grow', 'analyze', 'solve', 'research', 'code', 'write', 'read']
-        }
-        
-        # Count keyword matches in each category
-        mood_scores = {}
-        for mood, keywords in mood_keywords.items():
-            mood_scores[mood] = sum(1 for word in keywords if word in text_lower)
-        
-        logger.info(f"Keyword matches: {mood_scores}")
+        keyword_mood = max(mood_scores, key=mood_scores.get)
+        confidence = keyword_confidence(mood_scores)
+        logger.info(f"Keyword matches: {mood_scores} (confidence {confidence:.2f})")
         
-        # If we have keyword matches, use the category with the most matches
-        max_score = max(mood_scores.values()) if mood_scores else 0
-        if max_score > 0:
-            # Get all moods with the max score
-            top_moods = [mood for mood, score in mood_scores.items() if score == max_score]
-            if len(top_moods) == 1:
-                return top_moods[0]
+        # Confident keyword result: skip the model entirely
+        if confidence >= confidence_threshold:
+            return {'mood': keyword_mood, 'confidence': confidence, 'tier': 'keyword'}
         
-        # If no clear winner from keywords or tied, try sentiment analysis if available
-        if mood_analyzer is not None:
+        # Otherwise try sentiment analysis if available and affordable
+        if mood_analyzer is not None and _model_fits_budget(start, latency_budget):
             try:
+                model_start = time.perf_counter()
                 result = mood_analyzer(text)[0]
-                # Map sentiment to mood
-                if result['label'] == 'POSITIVE':
-                    # For positive sentiment, check if it's more energetic or calm
-                    if any(word in text_lower for word in ['energetic', 'excited', 'happy', 'fun']):
-                        return "UPBEAT"
-                    elif any(word in text_lower for word in ['love', 'heart', 'sweet']):
-                        return "ROMANTIC"
-                    else:
-                        return "UPBEAT"
-                elif result['label'] == 'NEGATIVE':
-                    # For negative sentiment, check if it's sad or angry
-                    if any(word in text_lower for word in ['angry', 'mad', 'rage', 'hate']):
-                        return "INTENSE"
-                    else:
-                        return "MELANCHOLY"
-                else:  # Neutral
-                    # For neutral, check if it's focused or motivational
-                    if any(word in text_lower for word in ['work', 'study', 'focus']):
-                        return "FOCUSED"
-                    else:
-                        return "MOTIVATIONAL"
+                _record_model_latency(time.perf_counter() - model_start)
+                return {
+                    'mood': _sentiment_to_mood(result['label'], text_lower),
+                    'confidence': float(result['score']),
+                    'tier': 'model'
+                }
             except Exception as sentiment_error:
                 logger.error(f"Error in sentiment analysis: {str(sentiment_error)}")
                 # Continue to fallback
         
-        # Use text content analysis as a fallback
-        question_words = ['how', 'what', 'why', 'when', 'where', 'who']
-        if any(text_lower.startswith(word) for word in question_words) or '?' in text:
-            return "FOCUSED"  # Questions often indicate a focused state
+        # A weak keyword result, even a tie, still beats the text heuristics
+        if confidence > 0:
+            return {'mood': keyword_mood, 'confidence': confidence, 'tier': 'keyword'}
+        
+        return {'mood': _heuristic_mood(text, text_lower), 'confidence': 0.0, 'tier': 'heuristic'}
+            
+    except Exception as e:
+        logger.error(f"Error detecting mood: {str(e)}")
+        return {'mood': "MOTIVATIONAL", 'confidence': 0.0, 'tier': 'heuristic'}  # Default fallback mood
+
+def detect_mood_chunked(text, confidence_threshold=KEYWORD_CONFIDENCE_THRESHOLD,
+                        latency_budget=None, window_chars=WINDOW_CHARS,
+                        batch_size=BATCH_SIZE, max_windows=MAX_WINDOWS):
+    """Detect mood for long text by scoring sentence-aligned windows in batches
+    
+    Keyword counts and sentiment votes are accumulated batch by batch, and
+    reading stops early once one mood clearly dominates, the budget runs out
+    or `max_windows` windows have been scored.
+    
+    Returns:
+        dict: Same keys as detect_mood_with_confidence plus 'windows', the
+            number of windows read
+    """
+    start = time.perf_counter()
+    try:
+        mood_scores = dict.fromkeys(MOOD_KEYWORDS, 0)
+        sentiment_votes = {}  # label -> summed model score
+        read_windows = []  # Only the windows actually read, for the cue-word checks
+        confidence = 0.0
+        windows = iter_text_windows(text, window_chars)
+        
+        while len(read_windows) < max_windows:
+            batch = []
+            for window in windows:
+                batch.append(window)
+                if len(batch) >= min(batch_size, max_windows - len(read_windows)):
+                    break
+            if not batch:
+                break
+            read_windows.extend(batch)
+            
+            for window in batch:
+                for mood, score in _keyword_scores(window.lower()).items():
+                    mood_scores[mood] += score
+            confidence = keyword_confidence(mood_scores)
+            
+            # Score the batch with the model while keywords alone aren't convincing
+            if (confidence < confidence_threshold and mood_analyzer is not None
+                    and _model_fits_budget(start, latency_budget, len(batch))):
+                try:
+                    model_start = time.perf_counter()
+                    results = mood_analyzer(batch, batch_size=len(batch), truncation=True)
+                    _record_model_latency((time.perf_counter() - model_start) / len(batch))
+                    for result in results:
+                        sentiment_votes[result['label']] = sentiment_votes.get(result['label'], 0.0) + result['score']
+                except Exception as sentiment_error:
+                    logger.error(f"Error in sentiment analysis: {str(sentiment_error)}")
+            
+            if keyword_margin(mood_scores) >= EARLY_EXIT_MARGIN:
+                break
+            total_votes = sum(sentiment_votes.values())
+            if (len(read_windows) >= batch_size and total_votes
+                    and max(sentiment_votes.values()) / total_votes >= EARLY_EXIT_CONFIDENCE):
+                break
+            if latency_budget is not None and time.perf_counter() - start > latency_budget:
+                break
         
-        # Check for exclamation marks or all caps (excitement or intensity)
-        if '!' in text or text.isupper():
-            return "UPBEAT" if any(word in text_lower for word in ['love', 'happy', 'great']) else "INTENSE"
+        # Later checks only look at what was read, keeping them bounded by max_windows
+        read_text = " ".join(read_windows)
+        read_lower = read_text.lower()
+        logger.info(f"Chunked keyword matches over {len(read_windows)} windows: {mood_scores} "
+                    f"(confidence {confidence:.2f}), sentiment votes: {sentiment_votes}")
         
-        # If still no match, use text length as a heuristic
-        if len(text) < 15:
-            return "UPBEAT"  # Short texts tend to be more direct/energetic
-        elif len(text) > 40:
-            return "CALMING"  # Longer texts tend to be more reflective
+        keyword_mood = max(mood_scores, key=mood_scores.get)
+        if confidence >= confidence_threshold:
+            decision = {'mood': keyword_mood, 'confidence': confidence, 'tier': 'keyword'}
+        elif sentiment_votes:
+            label = max(sentiment_votes, key=sentiment_votes.get)
+            decision = {
+                'mood': _sentiment_to_mood(label, read_lower),
+                'confidence': sentiment_votes[label] / sum(sentiment_votes.values()),
+                'tier': 'model'
+            }
+        elif confidence > 0:
+            decision = {'mood': keyword_mood, 'confidence': confidence, 'tier': 'keyword'}
         else:
-            return "MOTIVATIONAL"  # Default for medium-length text
-            
+            decision = {'mood': _heuristic_mood(read_text, read_lower), 'confidence': 0.0, 'tier': 'heuristic'}
+        decision['windows'] = len(read_windows)
+        return decision
+    
     except Exception as e:
         logger.error(f"Error detecting mood: {str(e)}")
-        return "MOTIVATIONAL"  # Default fallback mood
\ No newline at end of file
+        return {'mood': "MOTIVATIONAL", 'confidence': 0.0, 'tier': 'heuristic', 'windows': 0}
+
+def detect_mood(text, **kwargs):
+    return detect_mood_with_confidence(text, **kwargs)['mood']
+
+if __name__ == '__main__':
+    print(f"Keyword confidence by margin: {KEYWORD_CALIBRATION}")
+    print(f"Default threshold (model path upper bound): {KEYWORD_CONFIDENCE_THRESHOLD:.2f}")
+    if mood_analyzer is not None:
+        print(f"Measured model path accuracy: {model_path_accuracy(MOOD_SAMPLES, mood_analyzer):.2f}")
+    model_calls = sum(keyword_confidence(_keyword_scores(text.lower())) < KEYWORD_CONFIDENCE_THRESHOLD
+                      for text, _ in MOOD_SAMPLES)
+    print(f"Samples sent to the model at the default threshold: {model_calls}/{len(MOOD_SAMPLES)}")
@@ -0,0 +1,157 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any
+
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler('app.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+SAFETENSORS_DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8,
+    'U8': torch.uint8, 'BOOL': torch.bool
+}
+
+# Keep mappings alive for as long as tensors view them
+_mapped_files = []
+
+
+def mmap_safetensors(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Map a .safetensors file into memory and return tensors that view the mapping directly.
+    Pages come from the OS page cache, so every process mapping the same file shares them.
+    """
+    with open(path, 'rb') as f:
+        header_len = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_len))
+        # ACCESS_COPY gives writable (copy-on-write) pages so torch accepts the buffer,
+        # while untouched pages stay shared with the page cache
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    _mapped_files.append(mapped)
+
+    data_start = 8 + header_len
+    tensors = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = SAFETENSORS_DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        count = (end - begin) // torch.tensor([], dtype=dtype).element_size()
+        if count == 0:
+            tensors[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + begin)
+        tensors[name] = tensor.view(info['shape'])
+    return tensors
+
+
+@contextmanager
+def _parameters_on_meta():
+    """
+    Create every parameter registered inside the block on the meta device, so
+    building a model allocates no weight memory. Buffers stay on the CPU: the
+    non-persistent ones (e.g. position_ids) are not in the checkpoint and
+    must keep the values the model computed for them.
+    """
+    original = torch.nn.Module.register_parameter
+
+    def register_parameter(module, name, param):
+        original(module, name, param)
+        if param is not None:
+            module._parameters[name] = torch.nn.Parameter(param.to('meta'), requires_grad=param.requires_grad)
+
+    torch.nn.Module.register_parameter = register_parameter
+    try:
+        yield
+    finally:
+        torch.nn.Module.register_parameter = original
+
+
+def load_shared_model(model_dir: str):
+    """
+    Build a sequence classification model whose weights are memory-mapped from
+    the local safetensors files in `model_dir`, without copying them.
+    Raises if the files don't provide every weight the model expects.
+    """
+    files = sorted(glob.glob(os.path.join(model_dir, '*.safetensors')))
+    if not files:
+        raise FileNotFoundError(f"No .safetensors files in {model_dir}")
+
+    state_dict = {}
+    for path in files:
+        state_dict.update(mmap_safetensors(path))
+
+    config = AutoConfig.from_pretrained(model_dir)
+    with _parameters_on_meta():
+        model = AutoModelForSequenceClassification.from_config(config)
+    # assign=True swaps in the mapped tensors instead of copying into fresh parameters;
+    # strict=True so a mismatched export fails instead of running with meta weights
+    model.load_state_dict(state_dict, strict=True, assign=True)
+    model.eval()
+    model.requires_grad_(False)
+    return model
+
+
+def load_shared_pipeline(model_dir: str):
+    """
+    Build a text-classification pipeline around load_shared_model(model_dir).
+    """
+    model = load_shared_model(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return pipeline("text-classification", model=model, tokenizer=tokenizer, device=-1)
+
+
+def export_model(model_name: str, model_dir: str):
+    """
+    Save a hub model and tokenizer to `model_dir` as safetensors for shared loading.
+    """
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model.save_pretrained(model_dir, safe_serialization=True)
+    tokenizer.save_pretrained(model_dir)
+    logger.info(f"Exported {model_name} to {model_dir}")
+
+
+def get_memory_usage() -> Dict[str, Any]:
+    """
+    Return this process's memory in MB: 'rss', 'pss' and 'shared' (Linux only).
+    PSS splits shared pages between the processes mapping them, so summing it
+    across workers gives their true combined footprint.
+    """
+    try:
+        usage = {}
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    usage[parts[0].rstrip(':')] = int(parts[1]) / 1024  # kB -> MB
+        return {
+            'rss': usage.get('Rss', 0.0),
+            'pss': usage.get('Pss', 0.0),
+            'shared': usage.get('Shared_Clean', 0.0) + usage.get('Shared_Dirty', 0.0)
+        }
+    except OSError:
+        return {}
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 3:
+        print("Usage: python -m utils.shared_model <hub model name> <output dir>")
+        sys.exit(1)
+    export_model(sys.argv[1], sys.argv[2])
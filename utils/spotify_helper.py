@@ -1,5 +1,6 @@
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from spotipy.cache_handler import CacheFileHandler
 import os
 import json
 from datetime import datetime
@@ -23,18 +24,49 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # Spotify authentication setup
-def setup_spotify():
+def create_auth_manager(cache_handler=None, requests_session=True, open_browser=True):
+    """Create a SpotifyOAuth manager for the app's credentials and scopes
+
+    Args:
+        cache_handler: Where the user's token is kept (the .cache file if None)
+        requests_session: Shared requests.Session to reuse pooled connections,
+            or True to let spotipy create its own
+        open_browser: Whether a missing token may start spotipy's interactive
+            login; web sessions pass False and log in via get_authorize_url
+
+    Returns:
+        SpotifyOAuth
+    """
+    client_id = os.getenv('SPOTIFY_CLIENT_ID')
+    client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
+    redirect_uri = os.getenv('SPOTIFY_REDIRECT_URI', 'http://127.0.0.1:8501')  # The Streamlit app itself
+
+    return SpotifyOAuth(
+        client_id=client_id,
+        client_secret=client_secret,
+        redirect_uri=redirect_uri,
+        scope='user-library-read user-read-private user-read-recently-played',
+        cache_handler=cache_handler or CacheFileHandler(),
+        requests_session=requests_session,
+        open_browser=open_browser
+    )
+
+def setup_spotify(auth_manager=None, requests_session=True):
+    """Create an authenticated Spotify client
+
+    Args:
+        auth_manager: Auth manager to use (create_auth_manager() if None)
+        requests_session: Shared requests.Session to reuse pooled connections,
+            or True to let spotipy create its own
+
+    Returns:
+        spotipy.Spotify or None if setup failed
+    """
     try:
-        client_id = os.getenv('SPOTIFY_CLIENT_ID')
-        client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
-        redirect_uri = os.getenv('SPOTIFY_REDIRECT_URI', 'http://127.0.0.1:3000/callback')
-
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-            client_id=client_id,
-            client_secret=client_secret,
-            redirect_uri=redirect_uri,
-            scope='user-library-read user-read-private user-read-recently-played'
-        ))
+        sp = spotipy.Spotify(
+            auth_manager=auth_manager or create_auth_manager(requests_session=requests_session),
+            requests_session=requests_session
+        )
         logger.info("Spotify client created successfully")
         return sp
     except Exception as e:
@@ -80,7 +112,7 @@ def track_matches_mood(features, mood):
     return True  # Default to include if mood not recognized False
 
 # Get filtered tracks by mood
-def filter_tracks_by_mood(sp, tracks, mood, excluded_ids=set()):
+def filter_tracks_by_mood(sp, tracks, mood, excluded_ids=set(), history=None):
     try:
         # Import Streamlit and cleanup function
         import streamlit as st
@@ -110,7 +142,11 @@ def filter_tracks_by_mood(sp, tracks, mood, excluded_ids=set()):
         
         if not track_ids:
             return []
-        features = sp.audio_features(track_ids)
+        # Prefer audio features prefetched by the background refresher
+        if history is not None:
+            features = history.audio_features(sp, track_ids)
+        else:
+            features = sp.audio_features(track_ids)
         mood_tracks = []
         for item, feature in zip(filtered_tracks, features):
             if not feature:
@@ -126,25 +162,46 @@ def filter_tracks_by_mood(sp, tracks, mood, excluded_ids=set()):
         logger.error(f"Error filtering tracks by mood: {e}")
         return []
 
-# Main function to get recommendations
-def get_recommendations(sp, mood):
+# Get recently played items, from warm local history when available
+def get_recent_tracks(sp, history=None, limit=50):
+    if history is not None and history.is_warm:
+        return history.items(limit)
+    return sp.current_user_recently_played(limit=limit)['items']
+
+# Stream recommendations stage by stage
+def iter_recommendations(sp, mood, limit=5, history=None):
+    """Yield recommended tracks for a mood as soon as each stage produces them
+
+    Stages run in order: preferred tracks for the mood, mood-matching recently
+    played tracks, then filler from the saved library and recent history.
+
+    Args:
+        sp: Authenticated Spotify client
+        mood: The mood category to recommend for
+        limit: Maximum number of tracks to yield
+        history: Optional warm RecentlyPlayedHistory to read recent plays from
+
+    Yields:
+        dict: Spotify track objects, never repeating a track ID
+    """
     try:
         logger.info(f"Fetching recommendations for mood: {mood}")
         mood_prefs = get_mood_preferences(mood)
-        preferred_tracks = []
-        preferred_ids = set()
         all_track_ids = set()  # Track all IDs to prevent duplicates
+        saved_tracks = None
+        yielded = 0
 
-        # Get user's preferred tracks for this mood
+        # 1. User's preferred tracks for this mood
         if mood_prefs:
             saved_tracks = sp.current_user_saved_tracks(limit=50)['items']
+            preferred_tracks = []
+            preferred_ids = set()
             for item in saved_tracks:
                 track_id = item['track']['id']
                 for pref in mood_prefs:
-                    if track_id == pref['track_id'] and track_id not in all_track_ids:
+                    if track_id == pref['track_id'] and track_id not in preferred_ids:
                         preferred_tracks.append(item['track'])
                         preferred_ids.add(track_id)
-                        all_track_ids.add(track_id)
                         break
 
             # Sort by confidence score
@@ -153,70 +210,63 @@ def get_recommendations(sp, mood):
                 key=lambda t: next((p['confidence'] for p in mood_prefs if p['track_id'] == t['id']), 0),
                 reverse=True
             )
-            preferred_tracks = preferred_tracks[:3]  # Get top 3 preferred tracks
+            for track in preferred_tracks[:3]:  # Top 3 preferred tracks
+                if yielded >= limit:
+                    return
+                all_track_ids.add(track['id'])
+                yielded += 1
+                yield track
+
+        # 2. Recently played tracks that match the mood
+        recent_tracks = get_recent_tracks(sp, history)
+        mood_filtered = filter_tracks_by_mood(sp, recent_tracks, mood, excluded_ids=all_track_ids,
+                                              history=history)
 
-        # Get recently played tracks that match the mood
-        recent_tracks = sp.current_user_recently_played(limit=50)['items']
-        
-        # Filter tracks by mood and exclude already selected tracks
-        new_mood_tracks = []
-        mood_filtered = filter_tracks_by_mood(sp, recent_tracks, mood, excluded_ids=all_track_ids)
-        
         # Add up to 2 mood-matching tracks, avoiding duplicates
+        new_mood_count = 0
         for track in mood_filtered:
-            if track['id'] not in all_track_ids and len(new_mood_tracks) < 2:
-                new_mood_tracks.append(track)
+            if yielded >= limit or new_mood_count >= 2:
+                break
+            if track['id'] not in all_track_ids:
                 all_track_ids.add(track['id'])
+                new_mood_count += 1
+                yielded += 1
+                yield track
 
-        # Combine preferred and new tracks
-        result_tracks = preferred_tracks + new_mood_tracks
+        if yielded >= limit:
+            return
 
-        # If we still need more tracks to reach 5
-        if len(result_tracks) < 5:
-            needed = 5 - len(result_tracks)
-            
-            # Try to get tracks from user's saved library first
+        # 3. Filler from the user's saved library first
+        if saved_tracks is None:
             saved_tracks = sp.current_user_saved_tracks(limit=50)['items']
-            additional_tracks = []
-            
-            for item in saved_tracks:
-                track = item['track']
-                if track['id'] not in all_track_ids:
-                    additional_tracks.append(track)
-                    all_track_ids.add(track['id'])
-                    if len(additional_tracks) >= needed:
-                        break
-            
-            # If still not enough, use recently played tracks
-            if len(additional_tracks) < needed:
-                still_needed = needed - len(additional_tracks)
-                all_recent = [t['track'] for t in recent_tracks if t['track']['id'] not in all_track_ids]
-                
-                if all_recent:
-                    # Use random.sample only if we have enough tracks
-                    sample_size = min(still_needed, len(all_recent))
-                    if sample_size > 0:
-                        random_picks = random.sample(all_recent, sample_size)
-                        for track in random_picks:
-                            additional_tracks.append(track)
-                            all_track_ids.add(track['id'])
-            
-            result_tracks += additional_tracks
-
-        # Final check for duplicates (safety check)
-        final_tracks = []
-        final_track_ids = set()
-        
-        for track in result_tracks:
-            if track['id'] not in final_track_ids:
-                final_tracks.append(track)
-                final_track_ids.add(track['id'])
-                if len(final_tracks) >= 5:
-                    break
+        for item in saved_tracks:
+            if yielded >= limit:
+                return
+            track = item['track']
+            if track['id'] not in all_track_ids:
+                all_track_ids.add(track['id'])
+                yielded += 1
+                yield track
+
+        # If still not enough, use recently played tracks
+        all_recent = {}
+        for item in recent_tracks:
+            track = item['track']
+            if track['id'] not in all_track_ids:
+                all_recent.setdefault(track['id'], track)
+        all_recent = list(all_recent.values())
+        sample_size = min(limit - yielded, len(all_recent))
+        if sample_size > 0:
+            for track in random.sample(all_recent, sample_size):
+                all_track_ids.add(track['id'])
+                yielded += 1
+                yield track
 
-        logger.info(f"Returning {len(final_tracks)} recommendations with {len(final_track_ids)} unique tracks")
-        return final_tracks[:5]
+        logger.info(f"Streamed {yielded} recommendations for mood: {mood}")
 
     except Exception as e:
-        logger.error(f"Error in get_recommendations: {e}")
-        return []
+        logger.error(f"Error in iter_recommendations: {e}")
+
+# Main function to get recommendations
+def get_recommendations(sp, mood, history=None):
+    return list(iter_recommendations(sp, mood, history=history))
@@ -0,0 +1,253 @@
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+import logging
+from typing import Callable, Optional
+
+import requests
+import spotipy
+from requests.adapters import HTTPAdapter
+from spotipy.cache_handler import CacheFileHandler, MemoryCacheHandler
+from urllib3.util.retry import Retry
+
+from utils.spotify_helper import create_auth_manager, setup_spotify
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler('spotify.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_DIR = '.spotify_cache'
+MAX_CLIENTS = 100  # LRU cap on live per-user clients
+IDLE_TIMEOUT = 30 * 60  # Seconds before an unused client is dropped (its token is kept)
+TOKEN_RETENTION = 30 * 24 * 60 * 60  # Token caches unused this long are deleted at startup
+REFRESH_MARGIN = 5 * 60  # Refresh tokens this many seconds before expiry
+LOGIN_TIMEOUT = 10 * 60  # Seconds a login link's state stays valid
+MAX_PENDING_LOGINS = 1000
+
+
+def create_http_session(pool_size: int = 32) -> requests.Session:
+    """
+    Create a keep-alive HTTP session shared by every pooled Spotify client.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class SpotifyClientPool:
+    """
+    Per-user Spotify clients with their own token caches over one shared HTTP connection pool.
+
+    Users log in through the web OAuth flow: send them to get_authorize_url(),
+    and pass the 'code' and 'state' query parameters Spotify redirects back with
+    to complete_login(), which returns the Spotify user id the pool is keyed by.
+    Clients are only handed out for users with a token, so the pool never starts
+    spotipy's interactive (browser/stdin) login. Evicting a client keeps the
+    user's token cache, so their next request rebuilds the client from it; the
+    token is only deleted on logout() or when it can't be refreshed.
+    """
+
+    def __init__(self, max_clients: int = MAX_CLIENTS, idle_timeout: float = IDLE_TIMEOUT,
+                 refresh_margin: float = REFRESH_MARGIN, cache_dir: str = TOKEN_CACHE_DIR,
+                 on_evict: Optional[Callable[[str], None]] = None,
+                 token_retention: float = TOKEN_RETENTION):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.token_retention = token_retention
+        self.refresh_margin = refresh_margin
+        self.cache_dir = cache_dir
+        self.on_evict = on_evict
+        self.session = create_http_session()
+        self._clients = OrderedDict()  # user_id -> (sp, last_used)
+        self._pending_logins = OrderedDict()  # OAuth state -> issued at
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._remove_stale_token_files()
+
+    def _cache_path(self, user_id: str) -> str:
+        safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', user_id)
+        return os.path.join(self.cache_dir, f'.cache-{safe_id}')
+
+    def _auth_manager(self, cache_handler):
+        return create_auth_manager(cache_handler, requests_session=self.session, open_browser=False)
+
+    def get_authorize_url(self) -> Optional[str]:
+        """
+        Return a Spotify login URL carrying a fresh single-use state,
+        or None if the app's Spotify credentials are missing or invalid.
+        """
+        state = secrets.token_urlsafe(16)
+        try:
+            url = self._auth_manager(MemoryCacheHandler()).get_authorize_url(state=state)
+        except Exception as e:
+            logger.error(f"Could not create Spotify login URL: {str(e)}")
+            return None
+        now = time.monotonic()
+        with self._lock:
+            while self._pending_logins and (
+                    len(self._pending_logins) >= MAX_PENDING_LOGINS
+                    or now - next(iter(self._pending_logins.values())) > LOGIN_TIMEOUT):
+                self._pending_logins.popitem(last=False)
+            self._pending_logins[state] = now
+        return url
+
+    def complete_login(self, code: str, state: Optional[str]) -> Optional[str]:
+        """
+        Exchange the authorization code from the OAuth redirect for a token,
+        store it in the user's token cache and return their Spotify user id.
+        Returns None if the state is unknown or expired or the exchange fails.
+        """
+        with self._lock:
+            issued = self._pending_logins.pop(state, None) if state else None
+        if issued is None or time.monotonic() - issued > LOGIN_TIMEOUT:
+            logger.warning("Rejected Spotify login with unknown or expired state")
+            return None
+        try:
+            auth_manager = self._auth_manager(MemoryCacheHandler())
+            token_info = auth_manager.get_access_token(code, check_cache=False)
+            user_id = spotipy.Spotify(auth=token_info['access_token'],
+                                      requests_session=self.session).current_user()['id']
+            CacheFileHandler(cache_path=self._cache_path(user_id)).save_token_to_cache(token_info)
+            logger.info(f"Spotify login completed for user {user_id}")
+            return user_id
+        except Exception as e:
+            logger.error(f"Spotify login failed: {str(e)}")
+            return None
+
+    def get_client(self, user_id: str):
+        """
+        Return the Spotify client for a logged-in user, creating it if needed.
+        Returns None if the user has no valid token and must log in again.
+        """
+        now = time.monotonic()
+        evicted = []
+        try:
+            with self._lock:
+                entry = self._clients.pop(user_id, None)  # A returning user isn't evicted as idle
+                evicted = self._evict_idle(now)
+                sp = None
+                if entry is None:
+                    cache_handler = CacheFileHandler(cache_path=self._cache_path(user_id))
+                    if cache_handler.get_cached_token():
+                        sp = setup_spotify(self._auth_manager(cache_handler), requests_session=self.session)
+                    if sp is not None:
+                        logger.info(f"Created pooled Spotify client ({len(self._clients) + 1} live)")
+                else:
+                    sp = entry[0]
+                if sp is not None:
+                    self._clients[user_id] = (sp, now)
+                    while len(self._clients) > self.max_clients:
+                        evicted_id, _ = self._clients.popitem(last=False)
+                        logger.info(f"Evicted least recently used Spotify client {evicted_id}")
+                        evicted.append(evicted_id)
+        except Exception as e:
+            logger.error(f"Error creating Spotify client: {str(e)}")
+            return None
+        finally:
+            self._finish_evictions(evicted)
+
+        if sp is None:
+            return None
+        if not self._refresh_if_expiring(sp):
+            self.logout(user_id)
+            return None
+        try:
+            os.utime(self._cache_path(user_id))  # Marks the token file as in use for stale cleanup
+        except OSError:
+            pass
+        return sp
+
+    def logout(self, user_id: str):
+        """
+        Drop a user's client and delete their token cache, so they must log in again.
+        """
+        with self._lock:
+            self._clients.pop(user_id, None)
+        try:
+            os.remove(self._cache_path(user_id))
+        except OSError:
+            pass
+        self._finish_evictions([user_id])
+
+    def _evict_idle(self, now: float) -> list:
+        evicted = []
+        while self._clients:
+            user_id, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del self._clients[user_id]
+            logger.info(f"Evicted idle Spotify client {user_id}")
+            evicted.append(user_id)
+        return evicted
+
+    def _finish_evictions(self, user_ids: list):
+        # Runs outside the pool lock: notifies listeners (token files are kept)
+        for user_id in user_ids:
+            if self.on_evict is not None:
+                try:
+                    self.on_evict(user_id)
+                except Exception as e:
+                    logger.error(f"Error in Spotify client eviction hook: {str(e)}")
+
+    def _remove_stale_token_files(self):
+        # Token files of users who haven't been back for token_retention seconds
+        cutoff = time.time() - self.token_retention
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.startswith('.cache-') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _refresh_if_expiring(self, sp) -> bool:
+        """
+        Refresh the access token ahead of expiry so API calls never block on it.
+        Returns False if the token can't be refreshed and the user must log in again.
+        """
+        try:
+            auth_manager = sp.auth_manager
+            token_info = auth_manager.cache_handler.get_cached_token()
+            if not token_info:
+                return False
+            if token_info['expires_at'] - int(time.time()) < self.refresh_margin:
+                auth_manager.refresh_access_token(token_info['refresh_token'])
+                logger.info("Proactively refreshed Spotify access token")
+            return True
+        except Exception as e:
+            logger.error(f"Error refreshing Spotify token: {str(e)}")
+            return False
+
+
+_pool: Optional[SpotifyClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> SpotifyClientPool:
+    """
+    Return the process-wide client pool, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SpotifyClientPool()
+        return _pool
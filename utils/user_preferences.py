@@ -1,5 +1,7 @@
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 import logging
 from typing import Dict, List, Any
@@ -17,6 +19,30 @@ logger = logging.getLogger(__name__)
 
 PREFERENCES_FILE = 'user_preferences.json'
 
+try:
+    import fcntl
+except ImportError:  # Windows: only writers within one process are serialized
+    fcntl = None
+
+_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _preferences_lock():
+    """
+    Serialize read-modify-write cycles across threads and worker processes,
+    so concurrent sessions don't lose each other's updates.
+    """
+    with _thread_lock:
+        with open(f"{PREFERENCES_FILE}.lock", 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 
 def load_preferences() -> Dict[str, List[Dict[str, Any]]]:
     """
@@ -37,10 +63,13 @@ def load_preferences() -> Dict[str, List[Dict[str, Any]]]:
 def save_preferences(preferences: Dict[str, List[Dict[str, Any]]]):
     """
     Save user preferences to JSON file.
+    Writes to a temporary file first so readers never see a partial file.
     """
     try:
-        with open(PREFERENCES_FILE, 'w') as f:
+        tmp_file = f"{PREFERENCES_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w') as f:
             json.dump(preferences, f, indent=4)
+        os.replace(tmp_file, PREFERENCES_FILE)
     except Exception as e:
         logger.error(f"Error saving preferences: {str(e)}")
 
@@ -52,27 +81,28 @@ def add_preference(mood: str, track_id: str, track_name: str, artist_name: str)
     try:
         logger.info(f"Adding preference for mood {mood}: {track_name} by {artist_name}")
         
-        # Load existing preferences
-        preferences = load_preferences()
-        
-        # Initialize mood list if it doesn't exist
-        if mood not in preferences:
-            preferences[mood] = []
-        
-        # Add new preference if it doesn't already exist
-        if not any(p['track_id'] == track_id for p in preferences[mood]):
-            preferences[mood].append({
-                'track_id': track_id,
-                'track_name': track_name,
-                'artist_name': artist_name,
-                'timestamp': datetime.now().isoformat(),
-                'confidence': 1.0  # Start with high confidence
-            })
+        with _preferences_lock():
+            # Load existing preferences
+            preferences = load_preferences()
+            
+            # Initialize mood list if it doesn't exist
+            if mood not in preferences:
+                preferences[mood] = []
             
-            # Save updated preferences
-            save_preferences(preferences)
-            logger.info(f"Successfully added preference for {track_name} in {mood} mood")
-            return True
+            # Add new preference if it doesn't already exist
+            if not any(p['track_id'] == track_id for p in preferences[mood]):
+                preferences[mood].append({
+                    'track_id': track_id,
+                    'track_name': track_name,
+                    'artist_name': artist_name,
+                    'timestamp': datetime.now().isoformat(),
+                    'confidence': 1.0  # Start with high confidence
+                })
+                
+                # Save updated preferences
+                save_preferences(preferences)
+                logger.info(f"Successfully added preference for {track_name} in {mood} mood")
+                return True
         
         logger.info(f"Track {track_name} already exists in {mood} mood preferences")
         return False
@@ -86,21 +116,22 @@ def update_preference(mood: str, track_id: str, feedback: str) -> bool:
     Update a track preference based on user feedback.
     """
     try:
-        preferences = load_preferences()
-        
-        if mood in preferences:
-            for pref in preferences[mood]:
-                if pref['track_id'] == track_id:
-                    # Update confidence based on feedback
-                    if feedback == 'like':
-                        pref['confidence'] = min(1.0, pref.get('confidence', 0.5) + 0.2)
-                    else:  # dislike
-                        pref['confidence'] = max(0.0, pref.get('confidence', 0.5) - 0.2)
-                    
-                    # Save updated preferences
-                    save_preferences(preferences)
-                    logger.info(f"Updated confidence for {pref['track_name']} in {mood} mood")
-                    return True
+        with _preferences_lock():
+            preferences = load_preferences()
+            
+            if mood in preferences:
+                for pref in preferences[mood]:
+                    if pref['track_id'] == track_id:
+                        # Update confidence based on feedback
+                        if feedback == 'like':
+                            pref['confidence'] = min(1.0, pref.get('confidence', 0.5) + 0.2)
+                        else:  # dislike
+                            pref['confidence'] = max(0.0, pref.get('confidence', 0.5) - 0.2)
+                        
+                        # Save updated preferences
+                        save_preferences(preferences)
+                        logger.info(f"Updated confidence for {pref['track_name']} in {mood} mood")
+                        return True
         
         return False
     except Exception as e: